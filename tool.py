@@ -1,126 +1,233 @@
-import json
-import csv
+import orjson
+import contextlib
 import os
+import mmap
+import itertools
 import multiprocessing
+from multiprocessing.pool import ThreadPool
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
 import time
 import datetime
-import re
+import io
+import shutil
+import sys
+import tempfile
+
+_PACKAGE_FIELD_TRANS = str.maketrans({"[": None, "]": None, '"': None, ";": " ", ",": " "})
 
 def load_requirements(requirements_file):
     requirements = {}
     if not os.path.exists(requirements_file):
         print(f"Requirements file not found: {requirements_file}")
         return requirements
-    with open(requirements_file, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or ":" not in line:
-                continue
-            resource, package_id = line.split(":", 1)
-            requirements[resource.strip()] = package_id.strip()
+    with open(requirements_file, "rb") as f:
+        text = f.read().decode("utf-8")
+    for line in text.splitlines():
+        if not line or ":" not in line:
+            continue
+        resource, _, package_id = line.partition(":")
+        requirements[resource.strip()] = package_id.strip()
     return requirements
 
 def load_customer_packages(csv_folder):
+    # Imported here so spawned scan workers don't pay for loading pandas.
+    import pandas as pd
     user_packages = {}
     csv_files = list(Path(csv_folder).glob("*.csv"))
     if not csv_files:
         print("No CSV files found in customers folder!")
         return user_packages
-    with open(csv_files[0], "r", encoding="utf-8") as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            username = row.get("Username", "").strip()
-            packages_field = row.get("Packages", "").strip()
-            if not username:
-                continue
-            username = username.lower()
-            clean_field = packages_field.replace("[", "").replace("]", "").replace('"', "")
-            clean_field = clean_field.replace(";", ",")
-            owned_packages = set(re.split(r"[,\s]+", clean_field))
-            owned_packages = {p.strip() for p in owned_packages if p.strip()}
-            if username not in user_packages:
-                user_packages[username] = set()
-            user_packages[username].update(owned_packages)
-    return user_packages
-
-def process_json_file(args):
-    json_file, requirements, user_packages = args
+    try:
+        customers = pd.read_csv(
+            csv_files[0],
+            encoding="utf-8",
+            dtype=str,
+            keep_default_na=False,
+            index_col=False,
+            usecols=lambda column: column in ("Username", "Packages"),
+        )
+    except pd.errors.EmptyDataError:
+        return user_packages
+    if "Username" not in customers:
+        return user_packages
+    usernames = customers["Username"].fillna("").str.strip().str.lower()
+    if "Packages" in customers:
+        packages_fields = customers["Packages"].fillna("").str.translate(_PACKAGE_FIELD_TRANS)
+    else:
+        packages_fields = [""] * len(customers)
+    for username, packages_field in zip(usernames, packages_fields):
+        if not username:
+            continue
+        user_packages.setdefault(username, set()).update(packages_field.split())
+    return {sys.intern(username): frozenset(map(sys.intern, packages)) for username, packages in user_packages.items()}
+
+_SMALL_FILE_SIZE = 64 * 1024
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+_PROBE_FILES = 64
+_IO_BOUND_CPU_FRACTION = 0.3
+
+_WORKER_REQS = {}
+_WORKER_USERS = {}
+_WORKER_REQ_KEYS = frozenset()
+_WORKER_REQ_ORDER = {}
+_WORKER_USE_MMAP = True
+
+def _read_fd(fd, size):
+    chunks = []
+    while size > 0:
+        chunk = os.read(fd, size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def _fadvise(fd, *advice):
+    # Readahead hints only; a failure must not fail the file.
+    for flag in advice:
+        try:
+            os.posix_fadvise(fd, 0, 0, flag)
+        except OSError:
+            pass
+
+def _init_worker(reqs, users):
+    global _WORKER_REQS, _WORKER_USERS, _WORKER_REQ_KEYS, _WORKER_REQ_ORDER
+    reqs = {sys.intern(resource): sys.intern(package_id) for resource, package_id in reqs.items()}
+    _WORKER_REQS, _WORKER_USERS = reqs, users
+    _WORKER_REQ_KEYS = frozenset(reqs)
+    _WORKER_REQ_ORDER = {resource: index for index, resource in enumerate(reqs)}
+
+def process_json_file(json_file):
+    requirements, user_packages, req_keys = _WORKER_REQS, _WORKER_USERS, _WORKER_REQ_KEYS
+    req_order = _WORKER_REQ_ORDER
+    file_name = os.path.basename(json_file)
     unauthorized_servers = []
     try:
-        with open(json_file, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            server_resources = data.get("Data", {}).get("resources", [])
-            owner_name = data.get("Data", {}).get("ownerName", "N/A")
-            owner_profile = data.get("Data", {}).get("ownerProfile", "N/A")
-            server_code = data.get("EndPoint", "N/A")
-            owner_key = owner_name.lower()
-            for resource, required_package in requirements.items():
-                if resource in server_resources:
-                    owner_owned = user_packages.get(owner_key, set())
-                    if required_package not in owner_owned:
-                        unauthorized_servers.append({
-                            "server_code": server_code,
-                            "owner_name": owner_name,
-                            "owner_profile": owner_profile,
-                            "resource": resource,
-                            "required_package": required_package,
-                            "file_name": json_file.name
-                        })
-    except (json.JSONDecodeError, UnicodeDecodeError) as e:
-        return [], f"Error reading {json_file.name}: {str(e)}"
+        fd = os.open(json_file, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            if _HAS_FADVISE:
+                _fadvise(fd, os.POSIX_FADV_SEQUENTIAL, os.POSIX_FADV_WILLNEED)
+            size = os.fstat(fd).st_size
+            # Threads only overlap I/O inside os.read; mmap page faults happen under the GIL.
+            if size <= _SMALL_FILE_SIZE or not _WORKER_USE_MMAP:
+                data = orjson.loads(_read_fd(fd, size))
+            else:
+                with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                    data = orjson.loads(view)
+        finally:
+            try:
+                if _HAS_FADVISE:
+                    _fadvise(fd, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+        server_data = data.get("Data", {})
+        server_resources = server_data.get("resources", [])
+        owner_name = server_data.get("ownerName", "N/A")
+        owner_profile = server_data.get("ownerProfile", "N/A")
+        server_code = data.get("EndPoint", "N/A")
+        del data, server_data
+        owner_key = sys.intern(owner_name.lower())
+        owner_owned = user_packages.get(owner_key) or frozenset()
+        resources_set = {resource for resource in server_resources if isinstance(resource, str)}
+        for resource in sorted(resources_set & req_keys, key=req_order.__getitem__):
+            required_package = requirements[resource]
+            if required_package not in owner_owned:
+                unauthorized_servers.append((server_code, owner_name, owner_profile, resource, required_package, file_name))
+    except (ValueError, UnicodeDecodeError) as e:
+        return [], f"Error reading {file_name}: {str(e)}"
     except Exception as e:
-        return [], f"Unexpected error with {json_file.name}: {str(e)}"
+        return [], f"Unexpected error with {file_name}: {str(e)}"
     return unauthorized_servers, None
 
-def scan_servers_parallel(servers_folder, requirements, user_packages):
-    json_files = list(Path(servers_folder).glob("*.json"))
+def format_server(server):
+    server_code, owner_name, owner_profile, resource, required_package, file_name = server
+    return (
+        f"Server Code: {server_code}\n"
+        f"Owner Name: {owner_name}\n"
+        f"Owner Profile: {owner_profile}\n"
+        f"Resource: {resource}\n"
+        f"Required Package: {required_package}\n"
+        f"JSON File: {file_name}\n"
+        + "-" * 40 + "\n"
+    )
+
+def process_json_batch(json_files):
+    unauthorized_servers = []
+    errors = []
+    for json_file in json_files:
+        result, error = process_json_file(json_file)
+        if error:
+            errors.append(error)
+        unauthorized_servers.extend(result)
+    report = "".join(format_server(server) for server in unauthorized_servers).encode("utf-8")
+    return report, len(unauthorized_servers), errors, len(json_files)
+
+def scan_servers_parallel(servers_folder, requirements, user_packages, results_file):
+    global _WORKER_USE_MMAP
+    json_files = []
+    if os.path.isdir(servers_folder):
+        # Path.glob matched case-insensitively on Windows, so *.JSON files count there.
+        normalise = str.lower if os.name == "nt" else str
+        with os.scandir(servers_folder) as entries:
+            json_files = [entry.path for entry in entries if normalise(entry.name).endswith(".json") and entry.is_file()]
     total_files = len(json_files)
     if total_files == 0:
         print("No JSON files found in servers folder!")
-        return [], 0, 0
+        return 0, 0
     print(f"Found {total_files} JSON files. Starting scan...")
-    args_list = [(file, requirements, user_packages) for file in json_files]
-    unauthorized_servers = []
     processed_files = 0
     found_servers = 0
-    with ProcessPoolExecutor(max_workers=multiprocessing.cpu_count()) as executor:
-        future_to_file = {executor.submit(process_json_file, args): args[0] for args in args_list}
-        for future in as_completed(future_to_file):
-            processed_files += 1
-            result, error = future.result()
-            if error:
+    _init_worker(requirements, user_packages)
+    probe_files, json_files = json_files[:_PROBE_FILES], json_files[_PROBE_FILES:]
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    probe_result = process_json_batch(probe_files)
+    wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    workers = multiprocessing.cpu_count()
+    batch_size = max(16, len(json_files) // (workers * 8))
+    batches = [json_files[i:i + batch_size] for i in range(0, len(json_files), batch_size)]
+    io_bound = wall_time > 0 and cpu_time / wall_time < _IO_BOUND_CPU_FRACTION
+    _WORKER_USE_MMAP = not (batches and io_bound)
+    if not batches:
+        pool = None
+    elif io_bound:
+        pool = ThreadPool(min(32, 4 * workers))
+    elif sys.platform.startswith("linux"):
+        pool = multiprocessing.get_context("fork").Pool(workers)
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(requirements, user_packages))
+    with pool or contextlib.nullcontext():
+        results = [probe_result]
+        if pool is not None:
+            results = itertools.chain(results, pool.imap_unordered(process_json_batch, batches))
+        for report, hit_count, errors, batch_count in results:
+            processed_files += batch_count
+            for error in errors:
                 print(f"  {error}")
-            if result:
-                found_servers += len(result)
-                unauthorized_servers.extend(result)
+            if hit_count:
+                found_servers += hit_count
+                results_file.write(report)
             progress = (processed_files / total_files) * 100
             print(f"\rProcessed: {processed_files}/{total_files} files ({progress:.1f}%) | Found: {found_servers} unauthorized servers", end="")
     print()
-    return unauthorized_servers, processed_files, found_servers
+    return processed_files, found_servers
 
-def save_results_to_file(unauthorized_servers, requirements):
+def save_results_to_file(results_file, found_servers, requirements):
     os.makedirs("outputs", exist_ok=True)
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"outputs/5DB-Check-ID_{timestamp}.txt"
-    with open(filename, "w", encoding="utf-8") as f:
+    with open(filename, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write("=" * 80 + "\n")
         f.write("UNAUTHORIZED SERVERS REPORT\n")
         f.write("=" * 80 + "\n")
         f.write(f"Requirements Checked: {len(requirements)} resources\n")
         f.write(f"Report Generated: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Total Unauthorized Servers Found: {len(unauthorized_servers)}\n")
+        f.write(f"Total Unauthorized Servers Found: {found_servers}\n")
         f.write("=" * 80 + "\n\n")
-        if unauthorized_servers:
-            for server in unauthorized_servers:
-                f.write(f"Server Code: {server['server_code']}\n")
-                f.write(f"Owner Name: {server['owner_name']}\n")
-                f.write(f"Owner Profile: {server['owner_profile']}\n")
-                f.write(f"Resource: {server['resource']}\n")
-                f.write(f"Required Package: {server['required_package']}\n")
-                f.write(f"JSON File: {server['file_name']}\n")
-                f.write("-" * 40 + "\n")
+        if found_servers:
+            results_file.seek(0)
+            body = io.TextIOWrapper(results_file, encoding="utf-8", newline="")
+            shutil.copyfileobj(body, f)
+            body.detach()
         else:
             f.write("No unauthorized servers found!\n")
     return filename
@@ -133,27 +240,23 @@ def main():
     user_packages = load_customer_packages("customers")
     print(f"Loaded {len(user_packages)} customer records")
     print("Scanning servers for unauthorized usage...")
-    start_time = time.time()
-    unauthorized_servers, processed_files, found_servers = scan_servers_parallel("servers", requirements, user_packages)
-    end_time = time.time()
-    print(f"Scan completed in {end_time - start_time:.2f} seconds")
-    print(f"Processed {processed_files} files, found {found_servers} unauthorized servers")
-    output_file = save_results_to_file(unauthorized_servers, requirements)
-    print(f"Results saved to: {output_file}")
-    if unauthorized_servers:
-        print("\n" + "="*80)
-        print("UNAUTHORIZED SERVERS FOUND:")
-        print("="*80)
-        for server in unauthorized_servers:
-            print(f"Server Code: {server['server_code']}")
-            print(f"Owner Name: {server['owner_name']}")
-            print(f"Owner Profile: {server['owner_profile']}")
-            print(f"Resource: {server['resource']}")
-            print(f"Required Package: {server['required_package']}")
-            print(f"JSON File: {server['file_name']}")
-            print("-" * 40)
-    else:
-        print("\nNo unauthorized servers found!")
+    with tempfile.TemporaryFile("w+b", buffering=1 << 20) as results_file:
+        start_time = time.time()
+        processed_files, found_servers = scan_servers_parallel("servers", requirements, user_packages, results_file)
+        end_time = time.time()
+        print(f"Scan completed in {end_time - start_time:.2f} seconds")
+        print(f"Processed {processed_files} files, found {found_servers} unauthorized servers")
+        output_file = save_results_to_file(results_file, found_servers, requirements)
+        print(f"Results saved to: {output_file}")
+        if found_servers:
+            print("\n" + "="*80)
+            print("UNAUTHORIZED SERVERS FOUND:")
+            print("="*80)
+            results_file.seek(0)
+            for line in results_file:
+                print(line.decode("utf-8"), end="")
+        else:
+            print("\nNo unauthorized servers found!")
 
 if __name__ == "__main__":
     print(r"""